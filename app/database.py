@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
@@ -7,16 +7,34 @@ import os
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./workflow.db")
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
+    SQLALCHEMY_DATABASE_URL,
     # specific args for sqlite to handle threads if needed, ignored by postgres
-    connect_args={"check_same_thread": False} if "sqlite" in SQLALCHEMY_DATABASE_URL else {}
+    connect_args={"check_same_thread": False} if "sqlite" in SQLALCHEMY_DATABASE_URL else {},
+    # keep connections warm across requests and detect stale ones before use
+    pool_size=20,
+    max_overflow=10,
+    pool_pre_ping=True,
 )
 
+if "sqlite" in SQLALCHEMY_DATABASE_URL:
+    # WAL avoids writer-blocks-reader stalls and synchronous=NORMAL cuts the
+    # per-commit fsync cost, which matters now that we batch checkpoints.
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 def get_db():
+    # Session-per-request: FastAPI may run dependency setup, the endpoint,
+    # and teardown on different worker threads, so the session must be owned
+    # by the request (yield/close this exact object), never by a thread-local
+    # registry shared across in-flight requests.
     db = SessionLocal()
     try:
         yield db
@@ -1,16 +1,38 @@
 import time
 import uuid
 import json
+import os
+import operator
+import asyncio
+import hashlib
+from functools import lru_cache
 from typing import Dict, Any, List, Optional
 from sqlalchemy.orm import Session
-from .models import GraphCreateRequest, NodeConfig, EdgeConfig, Condition, GraphStateResponse
+from .models import GraphCreateRequest, GraphRunRequest, NodeConfig, EdgeConfig, Condition, GraphStateResponse
 from .registry import node_registry
-from .persistence_models import GraphModel, WorkflowRunModel
+from sqlalchemy import func as sa_func
+from .persistence_models import GraphModel, WorkflowRunModel, WorkflowLogModel
 from .database import SessionLocal
 
 class WorkflowExecutionError(Exception):
     pass
 
+# Operator dispatch table for edge conditions, resolved once per edge at
+# Graph construction instead of via a string-compare chain on every check.
+OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+    "in": lambda a, b: a in b,
+}
+
+def _always_false(a, b):
+    # Unknown operators evaluate to False, matching the old if/elif chain.
+    return False
+
 class Graph:
     def __init__(self, definition: GraphCreateRequest, graph_id: str):
         self.id = graph_id
@@ -18,118 +40,193 @@ class Graph:
         self.nodes = {n.id: n for n in definition.nodes}
         self.edges = definition.edges
         self.start_node = definition.start_node
+        # Adjacency index so each transition is O(out-degree) instead of a
+        # full scan over every edge in the graph. Each entry carries the
+        # edge's precompiled condition predicate (None = unconditional).
+        self.out_edges: Dict[str, List[tuple]] = {}
+        for e in definition.edges:
+            pred = None
+            if e.condition:
+                c = e.condition
+                pred = (c.key, OPS.get(c.operator, _always_false), c.value)
+            self.out_edges.setdefault(e.source, []).append((e.target, pred))
+        # Resolve every node's function once up front: fails fast on unknown
+        # registry names and keeps registry lookups off the execution path.
+        # Each entry is (func, is_async) so the loop knows whether to await
+        # it directly or push it to a worker thread.
+        self._func_cache = {}
+        for node_id, node in self.nodes.items():
+            func = node_registry.get(node.function)
+            if not func:
+                raise WorkflowExecutionError(f"Function {node.function} not found in registry.")
+            self._func_cache[node_id] = (func, asyncio.iscoroutinefunction(func))
 
     def get_node_func(self, node_id: str):
-        node_def = self.nodes.get(node_id)
-        if not node_def:
+        """Return (func, is_async) for the node."""
+        entry = self._func_cache.get(node_id)
+        if not entry:
             raise WorkflowExecutionError(f"Node {node_id} not found in graph.")
-        func = node_registry.get(node_def.function)
-        if not func:
-            raise WorkflowExecutionError(f"Function {node_def.function} not found in registry.")
-        return func
+        return entry
 
     def get_next_node(self, current_node_id: str, state: Dict[str, Any]) -> Optional[str]:
-        candidates = [e for e in self.edges if e.source == current_node_id]
-        for edge in candidates:
-            if edge.condition:
-                if self.evaluate_condition(edge.condition, state):
-                    return edge.target
-            else:
-                return edge.target
+        for target, pred in self.out_edges.get(current_node_id, ()):
+            if pred is None or pred[1](state.get(pred[0]), pred[2]):
+                return target
         return None
 
     def evaluate_condition(self, condition: Condition, state: Dict[str, Any]) -> bool:
-        val = state.get(condition.key)
-        target = condition.value
-        op = condition.operator
-
-        if op == "==": return val == target
-        elif op == "!=": return val != target
-        elif op == ">": return val > target
-        elif op == "<": return val < target
-        elif op == ">=": return val >= target
-        elif op == "<=": return val <= target
-        elif op == "in": return val in target
-        return False
+        op_func = OPS.get(condition.operator, _always_false)
+        return op_func(state.get(condition.key), condition.value)
+
+# Memo cache for nodes marked pure=True, keyed on (function name, registry
+# epoch, state digest). Values are serialized so a cache hit can't leak a
+# shared mutable dict between runs.
+_node_memo: Dict[tuple, str] = {}
+_NODE_MEMO_MAX = 4096
+
+def _memo_key(function_name: str, state: Dict[str, Any]) -> tuple:
+    digest = hashlib.blake2b(
+        json.dumps(state, sort_keys=True, default=str).encode(),
+        digest_size=16,
+    ).hexdigest()
+    return (function_name, node_registry.epoch, digest)
+
+def _memo_store(key: tuple, state: Dict[str, Any]):
+    if len(_node_memo) >= _NODE_MEMO_MAX:
+        # Simple bound: drop the oldest insertion.
+        _node_memo.pop(next(iter(_node_memo)))
+    _node_memo[key] = json.dumps(state, sort_keys=True, default=str)
+
+@lru_cache(maxsize=1024)
+def _build_graph_cached(graph_id: str, definition_json_str: str) -> Graph:
+    # Graph objects are immutable once built, so they can be shared across
+    # runs. Keying on the serialized definition means a changed definition
+    # under the same id simply misses the cache.
+    definition = GraphCreateRequest(**json.loads(definition_json_str))
+    return Graph(definition, graph_id)
 
 class Engine:
+    def __init__(self, checkpoint_every: int = None):
+        # 0 = commit only at boundaries (suspend, failure, completion).
+        # N > 0 = additionally flush durability every N steps.
+        if checkpoint_every is None:
+            checkpoint_every = int(os.getenv("CHECKPOINT_EVERY", "0"))
+        self.checkpoint_every = checkpoint_every
+
     def _load_graph(self, db: Session, graph_id: str) -> Graph:
-        graph_model = db.query(GraphModel).filter(GraphModel.id == graph_id).first()
-        if not graph_model:
+        definition_json = db.query(GraphModel.definition_json).filter(GraphModel.id == graph_id).scalar()
+        if definition_json is None:
             raise ValueError(f"Graph {graph_id} not found")
-        # Reconstruct Graph definition from JSON
-        definition = GraphCreateRequest(**graph_model.definition_json)
-        return Graph(definition, graph_id)
+        # Reconstruct the Graph via the cache to skip repeated Pydantic
+        # validation of an unchanged definition.
+        return _build_graph_cached(graph_id, json.dumps(definition_json, sort_keys=True))
 
-    def create_graph(self, definition: GraphCreateRequest) -> str:
-        db = SessionLocal()
-        try:
-            graph_id = str(uuid.uuid4())
-            graph_model = GraphModel(id=graph_id, definition_json=definition.dict())
-            db.add(graph_model)
-            db.commit()
-            return graph_id
-        finally:
-            db.close()
+    def create_graph(self, db: Session, definition: GraphCreateRequest) -> str:
+        graph_id = uuid.uuid4().hex
+        graph_model = GraphModel(id=graph_id, definition_json=definition.dict())
+        db.add(graph_model)
+        db.commit()
+        return graph_id
 
-    async def run_graph(self, graph_id: str, initial_state: Dict[str, Any]) -> GraphStateResponse:
-        db = SessionLocal()
+    def create_run(self, db: Session, graph_id: str, initial_state: Dict[str, Any]) -> str:
+        """Insert the run record only; execution happens separately."""
         try:
-            # 1. Load Graph
+            graph = self._load_graph(db, graph_id)
+        except ValueError:
+            raise ValueError("Graph not found")
+
+        run_id = uuid.uuid4().hex
+        run_model = WorkflowRunModel(
+            run_id=run_id,
+            graph_id=graph_id,
+            status="running",
+            current_node_id=graph.start_node,
+            state=initial_state,
+        )
+        db.add(run_model)
+        self._log(db, run_model, f"Starting run {run_id} with graph {graph_id}")
+        db.commit()
+        return run_id
+
+    def create_runs(self, db: Session, requests: List[GraphRunRequest]) -> List[str]:
+        """Batch form of create_run: one multi-row INSERT and one commit."""
+        run_rows = []
+        log_rows = []
+        run_ids = []
+        for request in requests:
             try:
-                graph = self._load_graph(db, graph_id)
+                graph = self._load_graph(db, request.graph_id)
             except ValueError:
                 raise ValueError("Graph not found")
-
-            # 2. Create Run Record
-            run_id = str(uuid.uuid4())
-            run_model = WorkflowRunModel(
-                run_id=run_id,
-                graph_id=graph_id,
-                status="running",
-                current_node_id=graph.start_node,
-                state=initial_state,
-                logs=[f"Starting run {run_id} with graph {graph_id}"]
-            )
-            db.add(run_model)
+            run_id = uuid.uuid4().hex
+            run_ids.append(run_id)
+            run_rows.append({
+                "run_id": run_id,
+                "graph_id": request.graph_id,
+                "status": "running",
+                "current_node_id": graph.start_node,
+                "state": request.initial_state,
+            })
+            log_rows.append({
+                "run_id": run_id,
+                "seq": 0,
+                "message": f"Starting run {run_id} with graph {request.graph_id}",
+            })
+        if run_rows:
+            db.execute(WorkflowRunModel.__table__.insert(), run_rows)
+            db.execute(WorkflowLogModel.__table__.insert(), log_rows)
             db.commit()
+        return run_ids
 
-            # 3. Execute Loop
-            return self._execute_loop(db, run_model, graph)
-        finally:
-            db.close()
-
-    async def resume_run(self, run_id: str) -> GraphStateResponse:
+    async def execute_run(self, run_id: str) -> GraphStateResponse:
+        # Runs outside the request/response cycle (BackgroundTasks / batch
+        # tasks), so it owns a dedicated session for the whole execution.
         db = SessionLocal()
         try:
-            run_model = db.query(WorkflowRunModel).filter(WorkflowRunModel.run_id == run_id).first()
+            run_model = db.get(WorkflowRunModel, run_id)
             if not run_model:
                 raise ValueError("Run not found")
-            
             graph = self._load_graph(db, run_model.graph_id)
-
-            if run_model.status == "completed":
-                return self._to_response(run_model)
-            
-            if run_model.status == "awaiting_approval":
-                 # Manually transition back to running AND advance node
-                 # We assume the user 'Action' (calling resume) satisfies the wait.
-                 
-                 # Calculate next node
-                 next_node = graph.get_next_node(run_model.current_node_id, run_model.state)
-                 
-                 # Advance pointer
-                 run_model.current_node_id = next_node
-                 run_model.status = "running"
-                 
-                 self._log(run_model, f"Resuming from AWAITING_APPROVAL. Transitioning to {next_node}")
-                 db.commit()
-
-            return self._execute_loop(db, run_model, graph)
+            return await self._execute_loop(db, run_model, graph)
         finally:
             db.close()
 
-    def _execute_loop(self, db: Session, run: WorkflowRunModel, graph: Graph) -> GraphStateResponse:
+    async def run_graph(self, db: Session, graph_id: str, initial_state: Dict[str, Any]) -> GraphStateResponse:
+        """Create a run and execute it to its next boundary (blocking)."""
+        run_id = self.create_run(db, graph_id, initial_state)
+        return await self.execute_run(run_id)
+
+    async def resume_run(self, db: Session, run_id: str) -> GraphStateResponse:
+        # Lock the row so two concurrent resumes can't both observe
+        # awaiting_approval and double-execute (no-op on SQLite, where the
+        # version counter on the model serializes writers instead).
+        # Session.get hits the identity map before emitting SQL.
+        run_model = db.get(WorkflowRunModel, run_id, with_for_update=True)
+        if not run_model:
+            raise ValueError("Run not found")
+
+        graph = self._load_graph(db, run_model.graph_id)
+
+        if run_model.status == "completed":
+            return self._to_response(db, run_model)
+
+        if run_model.status == "awaiting_approval":
+            # Manually transition back to running AND advance node
+            # We assume the user 'Action' (calling resume) satisfies the wait.
+
+            # Calculate next node
+            next_node = graph.get_next_node(run_model.current_node_id, run_model.state)
+
+            # Advance pointer
+            run_model.current_node_id = next_node
+            run_model.status = "running"
+
+            self._log(db, run_model, f"Resuming from AWAITING_APPROVAL. Transitioning to {next_node}")
+            db.commit()
+
+        return await self._execute_loop(db, run_model, graph)
+
+    async def _execute_loop(self, db: Session, run: WorkflowRunModel, graph: Graph) -> GraphStateResponse:
         try:
             max_steps = 50
             steps = 0
@@ -141,90 +238,132 @@ class Engine:
 
                 steps += 1
                 node_id = run.current_node_id
-                self._log(run, f"Executing node: {node_id}")
+                self._log(db, run, f"Executing node: {node_id}")
                 
                 # Get function
-                func = graph.get_node_func(node_id)
-                
+                func, is_async = graph.get_node_func(node_id)
+                node_def = graph.nodes.get(node_id)
+
+                # Nodes marked pure are deterministic in their input state,
+                # so identical (function, state) pairs can reuse a memoized
+                # output instead of re-executing.
+                memo_key = None
+                if node_def is not None and node_def.pure:
+                    memo_key = _memo_key(node_def.function, run.state)
+
                 # Execute
                 try:
-                    # NOTE: Passing a copy of state to avoid reference issues, 
-                    # but returning dict updates it.
-                    current_state = dict(run.state)
-                    new_state = func(current_state)
-                    if new_state is not None:
-                        run.state = new_state
+                    cached = _node_memo.get(memo_key) if memo_key is not None else None
+                    if cached is not None:
+                        run.state = json.loads(cached)
+                    else:
+                        # State is handed to the node directly; the contract
+                        # (see registry.NodeFunction) is that nodes may mutate
+                        # it in-place or return a replacement dict.
+                        if is_async:
+                            new_state = await func(run.state)
+                        else:
+                            # Blocking node functions run in a worker thread so
+                            # they don't stall the event loop under concurrency.
+                            new_state = await asyncio.to_thread(func, run.state)
+                        if new_state is not None:
+                            run.state = new_state
+                        if memo_key is not None:
+                            _memo_store(memo_key, run.state)
                 except Exception as e:
-                    self._log(run, f"Error executing node {node_id}: {str(e)}")
-                    run.status = "failed"
-                    db.commit()
+                    self._log(db, run, f"Error executing node {node_id}: {str(e)}")
                     raise e
-                
-                # CHECKPOINT 1: State Updated
-                db.commit()
 
                 # Check for HITL Suspension
                 if run.state.get("__suspend__"):
-                    self._log(run, "Suspending for Approval (HITL).")
+                    self._log(db, run, "Suspending for Approval (HITL).")
                     run.status = "awaiting_approval"
                     # Remove the flag so it doesn't trigger again immediately on resume
                     state_copy = dict(run.state)
                     state_copy.pop("__suspend__", None)
                     run.state = state_copy
                     db.commit()
-                    return self._to_response(run)
+                    return self._to_response(db, run)
 
                 # Determine Next Node
                 next_node = graph.get_next_node(node_id, run.state)
                 
                 if next_node:
-                    self._log(run, f"Transition: {node_id} -> {next_node}")
+                    self._log(db, run, f"Transition: {node_id} -> {next_node}")
                     run.current_node_id = next_node
                 else:
-                    self._log(run, f"No transitions found from {node_id}. Ending.")
+                    self._log(db, run, f"No transitions found from {node_id}. Ending.")
                     run.current_node_id = None
-                
-                # CHECKPOINT 2: Node Transition Commited
-                db.commit()
+
+                # Continuation checkpoint: durable nodes (HITL, external
+                # side-effects) persist immediately; pure compute nodes are
+                # simply replayed from the last checkpoint after a crash.
+                # checkpoint_every adds periodic commits on top (off by
+                # default; commits are otherwise reserved for
+                # suspend/failure/completion boundaries).
+                if node_def is not None and node_def.durable:
+                    db.commit()
+                elif self.checkpoint_every and steps % self.checkpoint_every == 0:
+                    db.commit()
 
             if steps >= max_steps:
-                self._log(run, "Max steps reached. Terminating.")
-            
+                self._log(db, run, "Max steps reached. Terminating.")
+
             if not run.current_node_id:
                 run.status = "completed"
-                db.commit()
-            
-            return self._to_response(run)
+
+            db.commit()
+            return self._to_response(db, run)
 
         except Exception as e:
             run.status = "failed"
-            self._log(run, f"Run failed: {e}")
+            self._log(db, run, f"Run failed: {e}")
             db.commit()
             raise e
 
-    def _log(self, run: WorkflowRunModel, message: str):
-        # SQLAlchemy requires reassignment for JSON mutation detection sometimes, 
-        # or MutableList. Safest is to reassign.
-        current_logs = list(run.logs)
-        current_logs.append(message)
-        run.logs = current_logs
+    def _log(self, db: Session, run: WorkflowRunModel, message: str):
+        # Single-row insert into the append-only log table; the next seq is
+        # tracked on the run instance so we only hit the DB for it once.
+        seq = getattr(run, "_log_seq", None)
+        if seq is None:
+            seq = db.query(sa_func.max(WorkflowLogModel.seq)).filter(
+                WorkflowLogModel.run_id == run.run_id
+            ).scalar()
+            seq = -1 if seq is None else seq
+        seq += 1
+        run._log_seq = seq
+        db.add(WorkflowLogModel(run_id=run.run_id, seq=seq, message=message))
+
+    def _get_logs(self, db: Session, run_id: str) -> List[str]:
+        db.flush()
+        rows = db.query(WorkflowLogModel.message).filter(
+            WorkflowLogModel.run_id == run_id
+        ).order_by(WorkflowLogModel.seq).all()
+        return [message for (message,) in rows]
 
-    def _to_response(self, run: WorkflowRunModel) -> GraphStateResponse:
+    def _to_response(self, db: Session, run: WorkflowRunModel) -> GraphStateResponse:
         return GraphStateResponse(
             run_id=run.run_id,
             status=run.status,
             state=run.state,
-            logs=run.logs
+            logs=self._get_logs(db, run.run_id)
         )
 
-    def get_run(self, run_id: str) -> Optional[GraphStateResponse]:
-        db = SessionLocal()
-        try:
-            run = db.query(WorkflowRunModel).filter(WorkflowRunModel.run_id == run_id).first()
-            if run:
-                return self._to_response(run)
+    def get_run(self, db: Session, run_id: str) -> Optional[GraphStateResponse]:
+        # Read-only endpoint: fetch just the columns the response needs
+        # rather than hydrating a full ORM instance.
+        row = db.query(
+            WorkflowRunModel.run_id,
+            WorkflowRunModel.status,
+            WorkflowRunModel.state,
+        ).filter(WorkflowRunModel.run_id == run_id).first()
+        if not row:
             return None
-        finally:
-            db.close()
+        return GraphStateResponse(
+            run_id=row.run_id,
+            status=row.status,
+            state=row.state,
+            logs=self._get_logs(db, run_id)
+        )
 
 engine = Engine()
@@ -1,15 +1,37 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from typing import Dict, Any
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
+from typing import Dict, Any, List
+from sqlalchemy.orm import Session
 from .models import GraphCreateRequest, GraphRunRequest, GraphStateResponse
 from .engine import engine
 from .registry import node_registry
-from .database import engine as db_engine, Base
+from .database import engine as db_engine, Base, get_db
 
-# Initialize DB tables
-Base.metadata.create_all(bind=db_engine)
+# Node functions log at DEBUG; the default INFO level keeps per-step
+# logging cost near zero in production.
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 
 app = FastAPI(title="Durable Agent Orchestrator")
 
+@app.on_event("startup")
+async def init_db():
+    # DDL at startup rather than import time, so reloaders and test imports
+    # don't issue it. Set RUN_DB_INIT=0 when the schema is managed
+    # out-of-band (e.g. migrations) or when running multiple workers.
+    if os.getenv("RUN_DB_INIT", "1") == "1":
+        Base.metadata.create_all(bind=db_engine)
+
+@app.on_event("startup")
+async def tune_thread_pool():
+    # Blocking node functions run via asyncio.to_thread, which uses the
+    # loop's default executor; size it explicitly rather than relying on
+    # the interpreter default.
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=int(os.getenv("NODE_THREADS", "16"))))
+
 @app.get("/")
 def home():
     return {"message": "Welcome to the Agent Workflow Engine"}
@@ -19,30 +41,69 @@ def list_tools():
     return {"tools": node_registry.list_tools()}
 
 @app.post("/graph/create")
-def create_graph(request: GraphCreateRequest):
+def create_graph(request: GraphCreateRequest, db: Session = Depends(get_db)):
     try:
-        graph_id = engine.create_graph(request)
+        graph_id = engine.create_graph(db, request)
         return {"graph_id": graph_id}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/graph/run")
-async def run_graph(request: GraphRunRequest):
+async def run_graph(request: GraphRunRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    # Schedule execution in the background and return immediately so long
+    # workflows don't hold the HTTP connection; clients poll /graph/state.
     try:
-        run = await engine.run_graph(request.graph_id, request.initial_state)
-        return {
-            "run_id": run.run_id,
-            "status": run.status,
-            "final_state": run.state,
-            "logs": run.logs
-        }
+        run_id = engine.create_run(db, request.graph_id, request.initial_state)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    background_tasks.add_task(engine.execute_run, run_id)
+    return {"run_id": run_id, "status": "running"}
+
+@app.post("/graph/run_batch")
+async def run_batch(requests: List[GraphRunRequest], db: Session = Depends(get_db)):
+    # Fan out independent runs across the event loop; a semaphore bounds
+    # how many execute at once so the thread pool isn't oversubscribed.
+    # Run records are created in a single multi-row INSERT.
+    try:
+        run_ids = engine.create_runs(db, requests)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    sem = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENT_RUNS", "8")))
+
+    async def run_one(run_id: str):
+        async with sem:
+            return await engine.execute_run(run_id)
+
+    # Runs are independent: a failure in one must not cancel its siblings
+    # (which would strand them at status="running" with no executor), so
+    # collect per-run outcomes instead of failing the whole batch.
+    results = await asyncio.gather(*(run_one(run_id) for run_id in run_ids), return_exceptions=True)
+
+    responses = []
+    for run_id, result in zip(run_ids, results):
+        if isinstance(result, BaseException):
+            responses.append({
+                "run_id": run_id,
+                "status": "failed",
+                "detail": str(result)
+            })
+        else:
+            responses.append({
+                "run_id": result.run_id,
+                "status": result.status,
+                "final_state": result.state,
+                "logs": result.logs
+            })
+    return responses
+
 @app.post("/graph/resume/{run_id}")
-async def resume_run(run_id: str):
+async def resume_run(run_id: str, db: Session = Depends(get_db)):
     try:
-        run = await engine.resume_run(run_id)
+        run = await engine.resume_run(db, run_id)
         return {
             "run_id": run.run_id,
             "status": run.status,
@@ -53,8 +114,8 @@ async def resume_run(run_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/graph/state/{run_id}")
-def get_run_state(run_id: str):
-    run = engine.get_run(run_id)
+def get_run_state(run_id: str, db: Session = Depends(get_db)):
+    run = engine.get_run(db, run_id)
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
     
@@ -4,6 +4,13 @@ from pydantic import BaseModel
 class NodeConfig(BaseModel):
     id: str
     function: str  # The name of the function in the registry
+    # Durable nodes force a DB checkpoint after they run (use for HITL or
+    # external side-effects); pure compute nodes are replayed from the last
+    # checkpoint on crash recovery.
+    durable: bool = False
+    # Pure nodes are deterministic functions of their input state; the engine
+    # may reuse a memoized result for an identical (function, state) pair.
+    pure: bool = False
 
 class Condition(BaseModel):
     # A simple condition representation
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, JSON, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, JSON, DateTime, ForeignKey, Text, Index
+from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -6,19 +7,44 @@ from .database import Base
 class GraphModel(Base):
     __tablename__ = "graphs"
 
-    id = Column(String, primary_key=True, index=True)
+    # 32-char hex UUIDs (no hyphens): smaller keys index and compare faster
+    id = Column(String(32), primary_key=True, index=True)
     definition_json = Column(JSON, nullable=False)  # Store the full GraphCreateRequest as JSON
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class WorkflowRunModel(Base):
     __tablename__ = "workflow_runs"
+    __table_args__ = (
+        # Covers resume/listing lookups ("runs for graph X in status Y")
+        # and dashboard-style "recent active runs" queries.
+        Index("ix_runs_graph_status", "graph_id", "status"),
+        Index("ix_runs_status_updated", "status", "updated_at"),
+    )
 
-    run_id = Column(String, primary_key=True, index=True)
-    graph_id = Column(String, ForeignKey("graphs.id"), nullable=False)
+    run_id = Column(String(32), primary_key=True, index=True)
+    graph_id = Column(String(32), ForeignKey("graphs.id"), nullable=False)
     status = Column(String, default="created", index=True)  # running, completed, failed, awaiting_approval
     current_node_id = Column(String, nullable=True)
-    state = Column(JSON, default={})
-    logs = Column(JSON, default=[]) # Storing logs as specific JSON list
+    # MutableDict lets the ORM see in-place mutations by node functions, so
+    # the engine doesn't have to flag or reassign the column after each step.
+    state = Column(MutableDict.as_mutable(JSON), default=dict)
+    # Optimistic-locking counter: concurrent writers of the same run row
+    # raise StaleDataError instead of racing (covers SQLite, which ignores
+    # SELECT ... FOR UPDATE).
+    version = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    __mapper_args__ = {"version_id_col": version}
+
+class WorkflowLogModel(Base):
+    __tablename__ = "workflow_logs"
+
+    # Append-only: each log line is a single-row insert instead of a
+    # rewrite of a growing JSON blob on the run row.
+    id = Column(Integer, primary_key=True)
+    run_id = Column(String(32), ForeignKey("workflow_runs.run_id"), index=True)
+    seq = Column(Integer, nullable=False)
+    message = Column(Text, nullable=False)
+    ts = Column(DateTime, default=datetime.utcnow)
 
@@ -1,14 +1,33 @@
+import logging
 from typing import Callable, Dict, Any
 
-# Type for our node functions: takes state, returns modified state (or None to imply in-place mod)
+log = logging.getLogger("workflow.nodes")
+
+# Type for our node functions: takes state, returns modified state (or None to imply in-place mod).
+# The engine passes the live state dict without copying, so nodes may mutate it
+# in-place or return a replacement dict; either way the result is reassigned.
 NodeFunction = Callable[[Dict[str, Any]], Dict[str, Any]]
 
 class Registry:
     def __init__(self):
         self._functions: Dict[str, NodeFunction] = {}
+        # Bumped on every (re)registration; mixed into memo-cache keys so
+        # cached results of a replaced function are never reused.
+        self.epoch = 0
 
     def register(self, name: str, func: NodeFunction):
         self._functions[name] = func
+        self.epoch += 1
+
+    def node(self, name: str):
+        """Decorator form of register(); rejects duplicate names."""
+        def deco(func: NodeFunction) -> NodeFunction:
+            if name in self._functions:
+                raise ValueError(f"duplicate node {name}")
+            self._functions[name] = func
+            self.epoch += 1
+            return func
+        return deco
 
     def get(self, name: str) -> NodeFunction:
         return self._functions.get(name)
@@ -21,8 +40,9 @@ node_registry = Registry()
 
 # --- Data Quality Pipeline Tools ---
 
+@node_registry.node("profile_data")
 def profile_data(state: Dict[str, Any]) -> Dict[str, Any]:
-    print("-> Profiling Data...")
+    log.debug("Profiling data...")
     # Simulate loading a dataset
     if "data_quality_score" not in state:
         state["dataset_size"] = 1000
@@ -30,47 +50,42 @@ def profile_data(state: Dict[str, Any]) -> Dict[str, Any]:
         state["anomaly_count"] = state.get("anomaly_count", 50) 
     return state
 
+@node_registry.node("identify_anomalies")
 def identify_anomalies(state: Dict[str, Any]) -> Dict[str, Any]:
     count = state.get("anomaly_count", 0)
-    print(f"-> Identifying Anomalies: found {count} issues.")
+    log.debug("Identifying anomalies: found %s issues.", count)
     return state
 
+@node_registry.node("generate_rules")
 def generate_rules(state: Dict[str, Any]) -> Dict[str, Any]:
     count = state.get("anomaly_count", 0)
-    print(f"-> Generating Rules to fix {count} anomalies...")
+    log.debug("Generating rules to fix %s anomalies...", count)
     state["rules_generated"] = True
     return state
 
+@node_registry.node("apply_rules")
 def apply_rules(state: Dict[str, Any]) -> Dict[str, Any]:
-    print("-> Applying Rules (Cleaning data)...")
+    log.debug("Applying rules (cleaning data)...")
     current_anomalies = state.get("anomaly_count", 0)
     # Simulate cleaning: remove half of the anomalies
     remaining = int(current_anomalies / 2)
     state["anomaly_count"] = remaining
-    print(f"-> Cleaning Complete. Remaining anomalies: {remaining}")
+    log.debug("Cleaning complete. Remaining anomalies: %s", remaining)
     return state
 
+@node_registry.node("finish_pipeline")
 def finish_pipeline(state: Dict[str, Any]) -> Dict[str, Any]:
-    print("-> Pipeline Finished. Final State Reached.")
+    log.debug("Pipeline finished. Final state reached.")
     return state
 
-# Register them
-node_registry.register("profile_data", profile_data)
-node_registry.register("identify_anomalies", identify_anomalies)
-node_registry.register("generate_rules", generate_rules)
-node_registry.register("apply_rules", apply_rules)
-node_registry.register("apply_rules", apply_rules)
-node_registry.register("finish_pipeline", finish_pipeline)
-
 # HITL Tool
+@node_registry.node("wait_for_approval")
 def wait_for_approval(state: Dict[str, Any]) -> Dict[str, Any]:
-    print("-> Creating approval request...")
+    log.debug("Creating approval request...")
     # We don't block here technically; the engine handles the suspension based on a signal or we can just return.
     # But to follow the pattern, we might rely on the engine detecting this node or a flag.
     # For now, we'll just set a flag in the state that the engine check.
     state["__suspend__"] = True
     return state
 
-node_registry.register("wait_for_approval", wait_for_approval)
-
 
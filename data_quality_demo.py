@@ -4,6 +4,18 @@ import time
 
 BASE_URL = "http://127.0.0.1:8000"
 
+def poll_until_done(run_id, timeout=30):
+    # /graph/run returns immediately now; poll state until the run settles.
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        resp = requests.get(f"{BASE_URL}/graph/state/{run_id}")
+        resp.raise_for_status()
+        result = resp.json()
+        if result["status"] != "running":
+            return result
+        time.sleep(0.2)
+    raise TimeoutError(f"Run {run_id} still running after {timeout}s")
+
 def main():
     print("1. Creating Data Quality Pipeline Graph...")
     # Pipeline: 
@@ -55,11 +67,12 @@ def main():
         }
         resp = requests.post(f"{BASE_URL}/graph/run", json=run_req)
         resp.raise_for_status()
-        result = resp.json()
-        
+        run_id = resp.json()["run_id"]
+        result = poll_until_done(run_id)
+
         print("   Run Completed!")
         print(f"   Run ID: {result['run_id']}")
-        print(f"   Final State: {result['final_state']}")
+        print(f"   Final State: {result['state']}")
         print("   Logs:")
         for log in result['logs']:
             print(f"     {log}")
@@ -4,6 +4,18 @@ import sys
 
 BASE_URL = "http://127.0.0.1:8000"
 
+def poll_until_done(run_id, timeout=30):
+    # /graph/run now returns immediately; poll state until the run settles.
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        resp = requests.get(f"{BASE_URL}/graph/state/{run_id}")
+        resp.raise_for_status()
+        result = resp.json()
+        if result["status"] != "running":
+            return result
+        time.sleep(0.2)
+    raise TimeoutError(f"Run {run_id} still running after {timeout}s")
+
 def test_hitl_and_resume():
     print("\n--- Testing Durable Execution, HITL, and Recovery ---")
     
@@ -37,9 +49,10 @@ def test_hitl_and_resume():
         }
         resp = requests.post(f"{BASE_URL}/graph/run", json=run_req)
         resp.raise_for_status()
-        result = resp.json()
-        
-        run_id = result["run_id"]
+        run_id = resp.json()["run_id"]
+
+        # Execution happens in the background; wait for the suspension.
+        result = poll_until_done(run_id)
         status = result["status"]
         print(f"   Run ID: {run_id}")
         print(f"   Status: {status}")